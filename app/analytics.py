@@ -0,0 +1,312 @@
+import time
+import datetime
+import threading
+from collections import Counter, deque
+import redis
+
+# Sliding windows for sentiment and confidence aggregates
+WINDOWS = {"hour": 3600, "day": 86400}
+BUCKET_SECONDS = 60
+CONFIDENCE_BINS = 10
+
+# Redis keys use the "stats:" prefix so clearing the "analysis:*" cache keeps them
+REDIS_PREFIX = "stats"
+REDIS_PHRASE_CAPACITY = 1000
+
+
+# Space-Saving over a sorted set of counts (KEYS[1]) and a hash of error bounds
+# (KEYS[2]), run atomically so concurrent writers can't interleave an eviction.
+# ARGV: capacity, ttl, then the phrases to add.
+SPACE_SAVING_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+for i = 3, #ARGV do
+    local phrase = ARGV[i]
+    if redis.call('ZSCORE', KEYS[1], phrase) then
+        redis.call('ZINCRBY', KEYS[1], 1, phrase)
+    elseif redis.call('ZCARD', KEYS[1]) < capacity then
+        redis.call('ZADD', KEYS[1], 1, phrase)
+    else
+        -- Replace the smallest counter; its count becomes the new phrase's error bound
+        local victim = redis.call('ZPOPMIN', KEYS[1])
+        local floor = tonumber(victim[2])
+        redis.call('HDEL', KEYS[2], victim[1])
+        redis.call('ZADD', KEYS[1], floor + 1, phrase)
+        redis.call('HSET', KEYS[2], phrase, floor)
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+"""
+
+
+def confidence_bin(confidence) -> int:
+    """Map a confidence value onto a histogram bin, treating bad values as 0"""
+    try:
+        value = float(confidence)
+    except (TypeError, ValueError):
+        value = 0.0
+    if value != value:  # NaN
+        value = 0.0
+    value = min(max(value, 0.0), 1.0)
+    return min(int(value * CONFIDENCE_BINS), CONFIDENCE_BINS - 1)
+
+
+def normalize_phrases(key_phrases) -> set:
+    """Lowercase and de-duplicate the key phrases of one result"""
+    phrases = {str(phrase).strip().lower() for phrase in key_phrases or []}
+    phrases.discard("")
+    return phrases
+
+
+def _histogram(counts: list) -> list:
+    return [
+        {"range": f"{i / CONFIDENCE_BINS:.1f}-{(i + 1) / CONFIDENCE_BINS:.1f}", "count": count}
+        for i, count in enumerate(counts)
+    ]
+
+
+def _period_start(name: str, now: float) -> int:
+    return int(now // WINDOWS[name]) * WINDOWS[name]
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch. Tracks at most `capacity` items; any item
+    whose true count exceeds total / capacity is guaranteed to be present, and
+    each reported count overestimates the true count by at most `error`.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+
+    def add(self, item: str, count: int = 1):
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # Replace the smallest counter; its count becomes the new item's error bound
+            victim = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(victim)
+            del self.errors[victim]
+            self.counts[item] = floor + count
+            self.errors[item] = floor
+
+    def top(self, n: int = 10) -> list:
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{"phrase": item, "count": count, "error": self.errors[item]} for item, count in items]
+
+
+class _Bucket:
+    __slots__ = ("start", "sentiment", "confidence")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.sentiment = Counter()
+        self.confidence = [0] * CONFIDENCE_BINS
+
+
+class AnalyticsAggregator:
+    """
+    Rolling aggregates over analysis results, updated incrementally as results
+    are produced so queries never scan the cache.
+
+    Sentiment counts and confidence histograms are kept per minute bucket, and a
+    running total is kept for each sliding window: buckets are subtracted as
+    they fall out of the window, so queries cost the same regardless of traffic.
+    Key phrases are tracked with a Space-Saving sketch per current UTC hour and
+    day, since sketches can't subtract expired data.
+    """
+
+    def __init__(self, phrase_capacity: int = 100):
+        self.phrase_capacity = phrase_capacity
+        self._lock = threading.Lock()
+        self._current = None
+        self._windows = {
+            name: {"seconds": seconds, "buckets": deque(), "sentiment": Counter(),
+                   "confidence": [0] * CONFIDENCE_BINS}
+            for name, seconds in WINDOWS.items()
+        }
+        self._phrases = {
+            name: {"period_start": None, "sketch": SpaceSaving(phrase_capacity), "total": 0}
+            for name in WINDOWS
+        }
+
+    def _expire(self, now: float):
+        """Subtract buckets that have slid out of each window"""
+        for window in self._windows.values():
+            buckets = window["buckets"]
+            while buckets and buckets[0].start + BUCKET_SECONDS <= now - window["seconds"]:
+                expired = buckets.popleft()
+                window["sentiment"].subtract(expired.sentiment)
+                for i, count in enumerate(expired.confidence):
+                    window["confidence"][i] -= count
+
+    def _phrase_period(self, name: str, now: float) -> dict:
+        """Get the phrase sketch for the current hour or day, starting a new one at the boundary"""
+        period_start = _period_start(name, now)
+        period = self._phrases[name]
+        if period["period_start"] != period_start:
+            period.update(period_start=period_start, sketch=SpaceSaving(self.phrase_capacity), total=0)
+        return period
+
+    def record(self, result: dict, now: float = None):
+        """Add one analysis result to the aggregates"""
+        now = time.time() if now is None else now
+        sentiment = result.get("sentiment", "neutral")
+        bin_index = confidence_bin(result.get("confidence"))
+        phrases = normalize_phrases(result.get("key_phrases"))
+
+        with self._lock:
+            bucket_start = int(now // BUCKET_SECONDS) * BUCKET_SECONDS
+            if self._current is None or self._current.start != bucket_start:
+                self._current = _Bucket(bucket_start)
+                for window in self._windows.values():
+                    window["buckets"].append(self._current)
+            self._expire(now)
+
+            self._current.sentiment[sentiment] += 1
+            self._current.confidence[bin_index] += 1
+            for window in self._windows.values():
+                window["sentiment"][sentiment] += 1
+                window["confidence"][bin_index] += 1
+
+            for name in self._phrases:
+                period = self._phrase_period(name, now)
+                period["total"] += 1
+                for phrase in phrases:
+                    period["sketch"].add(phrase)
+
+    def summary(self, window: str, top_n: int = 10, now: float = None) -> dict:
+        """Get the sentiment mix, confidence histogram and top key phrases for a window"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            totals = self._windows[window]
+            sentiment = {name: count for name, count in totals["sentiment"].items() if count > 0}
+            histogram = _histogram(totals["confidence"])
+            period = self._phrase_period(window, now)
+            return {
+                "window": window,
+                "window_seconds": totals["seconds"],
+                "total_analyses": sum(sentiment.values()),
+                "sentiment": sentiment,
+                "confidence_histogram": histogram,
+                "key_phrases_since": datetime.datetime.utcfromtimestamp(period["period_start"]).isoformat(),
+                "key_phrases_analyses": period["total"],
+                "top_key_phrases": period["sketch"].top(top_n),
+            }
+
+
+class RedisAnalytics:
+    """
+    The same aggregates kept in Redis, so every API process and job worker
+    contributes to and reads from one shared view.
+
+    Each result increments per-minute and per-hour bucket hashes (with a TTL)
+    in a single pipeline. The hour window sums the last 60 minute buckets and
+    the day window sums the last 24 hour buckets, so a query reads a fixed
+    number of small hashes regardless of traffic; the day window is accurate
+    to the hour. Key phrases per UTC hour and day are a Space-Saving sketch of
+    REDIS_PHRASE_CAPACITY counters kept in a sorted set, updated by a Lua
+    script, with the error bounds in a companion hash.
+    """
+
+    def __init__(self, client: redis.Redis, phrase_capacity: int = REDIS_PHRASE_CAPACITY):
+        self.client = client
+        self.phrase_capacity = phrase_capacity
+        self._add_phrases = client.register_script(SPACE_SAVING_SCRIPT)
+
+    @staticmethod
+    def _bucket_key(granularity: str, start: int) -> str:
+        return f"{REDIS_PREFIX}:{granularity}:{start}"
+
+    @staticmethod
+    def _phrases_key(name: str, period_start: int) -> str:
+        return f"{REDIS_PREFIX}:phrases:{name}:{period_start}"
+
+    @staticmethod
+    def _errors_key(name: str, period_start: int) -> str:
+        return f"{REDIS_PREFIX}:phrase_errors:{name}:{period_start}"
+
+    @staticmethod
+    def _total_key(name: str, period_start: int) -> str:
+        return f"{REDIS_PREFIX}:analyses:{name}:{period_start}"
+
+    def record(self, result: dict, now: float = None):
+        """Add one analysis result to the shared aggregates"""
+        now = time.time() if now is None else now
+        sentiment_field = f"sentiment:{result.get('sentiment', 'neutral')}"
+        confidence_field = f"confidence:{confidence_bin(result.get('confidence'))}"
+        phrases = normalize_phrases(result.get("key_phrases"))
+
+        pipe = self.client.pipeline(transaction=False)
+        for granularity, size, ttl in (("minute", BUCKET_SECONDS, WINDOWS["hour"] + BUCKET_SECONDS),
+                                       ("hour", WINDOWS["hour"], WINDOWS["day"] + WINDOWS["hour"])):
+            key = self._bucket_key(granularity, int(now // size) * size)
+            pipe.hincrby(key, sentiment_field, 1)
+            pipe.hincrby(key, confidence_field, 1)
+            pipe.expire(key, ttl)
+
+        for name, seconds in WINDOWS.items():
+            period_start = _period_start(name, now)
+            total_key = self._total_key(name, period_start)
+            pipe.incr(total_key)
+            pipe.expire(total_key, seconds * 2)
+            if phrases:
+                self._add_phrases(
+                    keys=[self._phrases_key(name, period_start), self._errors_key(name, period_start)],
+                    args=[self.phrase_capacity, seconds * 2, *sorted(phrases)],
+                    client=pipe
+                )
+        pipe.execute()
+
+    def summary(self, window: str, top_n: int = 10, now: float = None) -> dict:
+        """Get the sentiment mix, confidence histogram and top key phrases for a window"""
+        now = time.time() if now is None else now
+        if window == "hour":
+            granularity, size, count = "minute", BUCKET_SECONDS, WINDOWS["hour"] // BUCKET_SECONDS
+        else:
+            granularity, size, count = "hour", WINDOWS["hour"], WINDOWS["day"] // WINDOWS["hour"]
+        newest = int(now // size) * size
+        period_start = _period_start(window, now)
+
+        pipe = self.client.pipeline(transaction=False)
+        for i in range(count):
+            pipe.hgetall(self._bucket_key(granularity, newest - i * size))
+        pipe.get(self._total_key(window, period_start))
+        pipe.zrevrange(self._phrases_key(window, period_start), 0, top_n - 1, withscores=True)
+        *buckets, total, top_phrases = pipe.execute()
+        top_phrases = [(phrase.decode() if isinstance(phrase, bytes) else phrase, int(score))
+                       for phrase, score in top_phrases]
+        errors = []
+        if top_phrases:
+            errors = self.client.hmget(self._errors_key(window, period_start), [phrase for phrase, _ in top_phrases])
+
+        sentiment = Counter()
+        confidence = [0] * CONFIDENCE_BINS
+        for bucket in buckets:
+            for field, value in bucket.items():
+                field = field.decode() if isinstance(field, bytes) else field
+                kind, _, name = field.partition(":")
+                if kind == "sentiment":
+                    sentiment[name] += int(value)
+                elif kind == "confidence":
+                    confidence[int(name)] += int(value)
+
+        return {
+            "window": window,
+            "window_seconds": WINDOWS[window],
+            "total_analyses": sum(sentiment.values()),
+            "sentiment": dict(sentiment),
+            "confidence_histogram": _histogram(confidence),
+            "key_phrases_since": datetime.datetime.utcfromtimestamp(period_start).isoformat(),
+            "key_phrases_analyses": int(total or 0),
+            "top_key_phrases": [
+                {"phrase": phrase, "count": count, "error": int(error or 0)}
+                for (phrase, count), error in zip(top_phrases, errors)
+            ],
+        }
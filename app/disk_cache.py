@@ -0,0 +1,139 @@
+import os
+import time
+import sqlite3
+import threading
+
+
+class DiskCache:
+    """
+    Persistent, size-bounded key-value cache backed by SQLite in WAL mode.
+
+    WAL lets readers proceed while another process writes, and every write runs
+    in an IMMEDIATE transaction, so several workers on one host can share the
+    same file. When the stored values exceed max_bytes the least recently used
+    entries are evicted down to low_watermark * max_bytes.
+
+    Reads only write back an entry's access time when it is older than
+    touch_interval seconds, so hits stay plain reads and don't queue on the
+    write lock; LRU order is therefore accurate to within touch_interval.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024,
+                 low_watermark: float = 0.9, busy_timeout_ms: int = 5000,
+                 touch_interval: float = 60):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self.touch_interval = touch_interval
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('total_bytes', 0)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get a connection for this thread, reconnecting after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str):
+        """Get a value, refreshing its access time for LRU eviction when it has gone stale"""
+        conn = self._connection()
+        row = conn.execute("SELECT value, accessed FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        if now - row[1] >= self.touch_interval:
+            # Don't wait on the write lock for a refresh; a later read can retry it
+            conn.execute("PRAGMA busy_timeout=0")
+            try:
+                conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+            except sqlite3.OperationalError:
+                pass
+            finally:
+                conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return row[0]
+
+    def set(self, key: str, value: bytes):
+        """Store a value and evict least recently used entries if over budget"""
+        conn = self._connection()
+        size = len(value)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+            old_size = row[0] if row else 0
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            conn.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'total_bytes'",
+                (size - old_size,)
+            )
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete oldest entries until the cache is under the low watermark"""
+        total = conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = self.max_bytes * self.low_watermark
+        freed = 0
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            if total - freed <= target:
+                break
+            evicted.append((key,))
+            freed += size
+
+        conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+        conn.execute("UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (freed,))
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Delete every key starting with prefix and return how many were removed"""
+        conn = self._connection()
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count, freed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache WHERE key LIKE ? ESCAPE '\\'",
+                (pattern,)
+            ).fetchone()
+            conn.execute("DELETE FROM cache WHERE key LIKE ? ESCAPE '\\'", (pattern,))
+            conn.execute("UPDATE meta SET value = value - ? WHERE name = 'total_bytes'", (freed,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return count
+
+    def stats(self) -> dict:
+        """Get the number of entries and stored bytes"""
+        conn = self._connection()
+        entries = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        total = conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+        return {"entries": entries, "bytes": total, "max_bytes": self.max_bytes}
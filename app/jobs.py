@@ -0,0 +1,73 @@
+import os
+import re
+import json
+import uuid
+import datetime
+import redis
+
+# Redis Streams job queue. Keys use the "jobs:" prefix so clearing the
+# "analysis:*" cache never drops queued work.
+JOB_STREAM = os.getenv("JOB_STREAM", "jobs:stream")
+JOB_GROUP = os.getenv("JOB_GROUP", "analyzers")
+DEAD_LETTER_STREAM = os.getenv("JOB_DEAD_LETTER_STREAM", "jobs:dead")
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "86400"))
+JOB_STREAM_MAXLEN = int(os.getenv("JOB_STREAM_MAXLEN", "100000"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Jobs delivered to a worker but not acknowledged within this time are retried
+JOB_CLAIM_IDLE_MS = int(os.getenv("JOB_CLAIM_IDLE_MS", "60000"))
+
+FINISHED_STATUSES = ("completed", "failed")
+# Job IDs are uuid4 hex strings; anything else can't name a job (or a stream key)
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def job_key(job_id: str) -> str:
+    """Generate the Redis key holding a job's state"""
+    return f"jobs:job:{job_id}"
+
+
+def ensure_group(client: redis.Redis):
+    """Create the stream and consumer group if they don't exist yet"""
+    try:
+        client.xgroup_create(JOB_STREAM, JOB_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def create_job(client: redis.Redis, text: str, result: dict = None) -> str:
+    """Record a new job and queue it, or store it as completed when a result is already known"""
+    job_id = uuid.uuid4().hex
+    job = {
+        "text": text,
+        "status": "queued",
+        "attempts": 0,
+        "created_at": datetime.datetime.utcnow().isoformat(),
+    }
+    if result is not None:
+        job["status"] = "completed"
+        job["result"] = json.dumps(result)
+        job["finished_at"] = job["created_at"]
+
+    pipe = client.pipeline()
+    pipe.hset(job_key(job_id), mapping=job)
+    pipe.expire(job_key(job_id), JOB_TTL_SECONDS)
+    if result is None:
+        pipe.xadd(JOB_STREAM, {"job_id": job_id}, maxlen=JOB_STREAM_MAXLEN, approximate=True)
+    pipe.execute()
+    return job_id
+
+
+def get_job(client: redis.Redis, job_id: str):
+    """Get a job's state as a dict, or None if it doesn't exist or has expired"""
+    if not JOB_ID_PATTERN.fullmatch(job_id):
+        return None
+    raw = client.hgetall(job_key(job_id))
+    if not raw:
+        return None
+
+    job = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+           for k, v in raw.items()}
+    job["attempts"] = int(job.get("attempts", 0))
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    return job
@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel, ConfigDict
+from typing import Optional
 import os
 import requests
 import json
+import asyncio
 import logging
 import datetime
 import hashlib
 import pickle
+import sqlite3
+import threading
 from dotenv import load_dotenv
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import redis
+from app.analytics import WINDOWS, AnalyticsAggregator, RedisAnalytics
+from app.disk_cache import DiskCache
+from app.jobs import FINISHED_STATUSES, create_job, get_job
+from app.negotiation import MSGPACK_RESPONSES, MsgpackRoute, render
+from app.profiling import (
+    SamplingProfiler,
+    ServerTimingMiddleware,
+    record_since_start,
+    stage,
+    stage_percentiles,
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -37,6 +52,9 @@ app = FastAPI(
     docs_url="/"
 )
 
+# Accept application/msgpack request bodies alongside JSON on every route
+app.router.route_class = MsgpackRoute
+
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -62,9 +80,38 @@ for redis_url in redis_connection_attempts:
 if not redis_client:
     logger.warning("❌ All Redis connection attempts failed. Running without Redis caching.")
 
+# Local persistent cache tier - sits behind Redis and keeps a warm cache when Redis is down
+disk_cache = None
+if os.getenv("DISK_CACHE_ENABLED", "true").lower() == "true":
+    disk_cache_path = os.getenv("DISK_CACHE_PATH", "cache/analysis_cache.db")
+    try:
+        disk_cache = DiskCache(
+            disk_cache_path,
+            max_bytes=int(float(os.getenv("DISK_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        )
+        logger.info(f"✅ Disk cache enabled at: {disk_cache_path}")
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"❌ Disk cache unavailable at {disk_cache_path}: {e}")
+        disk_cache = None
+
 # Get API key from environment variable
 GENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GENAI_URL = "https://api.openai.com/v1/chat/completions"
+GENAI_URL = os.getenv("GENAI_URL", "https://api.openai.com/v1/chat/completions")
+# Kept well under JOB_CLAIM_IDLE_MS so a hung upstream call falls back instead of stalling a job
+GENAI_TIMEOUT_SECONDS = float(os.getenv("GENAI_TIMEOUT_SECONDS", "20"))
+
+# Sampling profiler is opt-in since it exposes stack traces and writes to disk
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_PROFILE_SECONDS = 300
+
+def request_profiler(scope):
+    """Profile a request when profiling is enabled and it carries X-Profile: 1"""
+    if PROFILING_ENABLED and (b"x-profile", b"1") in scope["headers"]:
+        return SamplingProfiler(threading.get_ident(), output_dir=PROFILE_DIR)
+    return None
+
+app.add_middleware(ServerTimingMiddleware, profiler_factory=request_profiler)
 
 # Request and Response models
 class TextRequest(BaseModel):
@@ -95,23 +142,78 @@ class CacheStatsResponse(BaseModel):
     cache_misses: int
     hit_rate: float
 
+class JobResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    job_id: str
+    status: str
+    attempts: int = 0
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+class AnalyticsResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    window: str
+    window_seconds: int
+    total_analyses: int
+    sentiment: dict
+    confidence_histogram: list
+    key_phrases_since: str
+    key_phrases_analyses: int
+    top_key_phrases: list
+
+class StageStatsResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
+    stages: dict
+
+# Longest a client may wait on a job in a single long-poll request
+MAX_JOB_WAIT_SECONDS = 30
+
 # Cache statistics
 cache_stats = {"hits": 0, "misses": 0}
 
+# Rolling sentiment analytics, updated as new analyses are produced. They are
+# kept in Redis when available so API processes and job workers share them;
+# this in-memory aggregator is only used when running without Redis.
+analytics = AnalyticsAggregator()
+
+def get_analytics():
+    """Get the shared Redis analytics, or this process's own when Redis is unavailable"""
+    return RedisAnalytics(redis_client) if redis_client else analytics
+
 def get_cache_key(text: str) -> str:
     """Generate cache key from text content"""
     return f"analysis:{hashlib.md5(text.encode()).hexdigest()}"
 
 def get_cached_result(key: str):
-    """Get result from Redis cache"""
-    if not redis_client:
-        return None
-    
+    """Get result from Redis cache, falling back to the disk cache"""
+    cached = None
+    if redis_client:
+        try:
+            with stage("cache_get"):
+                cached = redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache read error: {e}")
+
+    if not cached and disk_cache:
+        try:
+            with stage("disk_get"):
+                cached = disk_cache.get(key)
+        except Exception as e:
+            logger.warning(f"Disk cache read error: {e}")
+
+        # Backfill Redis so later requests don't keep falling through to disk
+        if cached and redis_client:
+            try:
+                with stage("cache_set"):
+                    redis_client.set(key, cached)
+            except Exception as e:
+                logger.warning(f"Cache backfill error: {e}")
+
     try:
-        cached = redis_client.get(key)
         if cached:
             cache_stats["hits"] += 1
-            result = pickle.loads(cached)
+            with stage("unpickle"):
+                result = pickle.loads(cached)
             # Set cached to True when retrieving from cache
             result["cached"] = True
             return result
@@ -121,18 +223,34 @@ def get_cached_result(key: str):
     return None
 
 def set_cached_result(key: str, result: dict):
-    """Set result in Redis cache"""
-    if not redis_client:
+    """Set result in Redis cache and the disk cache"""
+    if not redis_client and not disk_cache:
         return
-    
-    try:
-        # Store with cached=False for new results
-        result_to_store = result.copy()
-        result_to_store["cached"] = False
-        redis_client.set(key, pickle.dumps(result_to_store))
-        logger.info(f"Cached result for key: {key}")
-    except Exception as e:
-        logger.warning(f"Cache write error: {e}")
+
+    # Store with cached=False for new results
+    result_to_store = result.copy()
+    result_to_store["cached"] = False
+    payload = pickle.dumps(result_to_store)
+
+    if redis_client:
+        try:
+            with stage("cache_set"):
+                redis_client.set(key, payload)
+            logger.info(f"Cached result for key: {key}")
+        except Exception as e:
+            logger.warning(f"Cache write error: {e}")
+
+    if disk_cache:
+        try:
+            with stage("disk_set"):
+                disk_cache.set(key, payload)
+        except Exception as e:
+            logger.warning(f"Disk cache write error: {e}")
+
+def render_analysis(request: Request, result_data: dict) -> Response:
+    """Serialize an analysis result as JSON or msgpack, timing it as its own stage"""
+    with stage("serialize"):
+        return render(request, AnalysisResponse(**result_data))
 
 def mock_ai_analysis(text: str) -> dict:
     """Mock AI analysis that simulates OpenAI responses without API calls"""
@@ -183,71 +301,30 @@ def mock_ai_analysis(text: str) -> dict:
         "confidence": round(confidence, 2)
     }
 
-@app.get("/health", response_model=HealthResponse)
-@limiter.limit("30/minute")
-async def health_check(request: Request):
-    """Health check endpoint for deployment monitoring"""
-    redis_status = "connected" if redis_client and redis_client.ping() else "disconnected"
-    
-    return HealthResponse(
-        status="healthy",
-        message="GenAI Text Analyzer API is running successfully!",
-        timestamp=datetime.datetime.utcnow().isoformat(),
-        version="1.0.0",
-        redis_status=redis_status
-    )
-
-@app.get("/cache/stats", response_model=CacheStatsResponse)
-@limiter.limit("30/minute")
-async def get_cache_stats(request: Request):
-    """Get cache statistics"""
-    total = cache_stats["hits"] + cache_stats["misses"]
-    hit_rate = cache_stats["hits"] / total if total > 0 else 0
-    
-    return CacheStatsResponse(
-        total_requests=total,
-        cache_hits=cache_stats["hits"],
-        cache_misses=cache_stats["misses"],
-        hit_rate=round(hit_rate, 2)
-    )
-
-@app.post("/analyze", response_model=AnalysisResponse)
-@limiter.limit("10/minute")  # 10 requests per minute per IP
-async def analyze_text(request: Request, text_request: TextRequest):
-    """
-    Analyze text for sentiment, key phrases, and generate a summary.
-    
-    - **text**: The input text to analyze (min 10 characters, max 1000 characters)
-    """
-    # Input validation
-    if len(text_request.text.strip()) < 10:
-        logger.warning(f"Text too short from IP: {request.client.host}")
-        raise HTTPException(
-            status_code=400, 
-            detail="Text must be at least 10 characters long"
-        )
-    
-    if len(text_request.text.strip()) > 1000:
-        logger.warning(f"Text too long from IP: {request.client.host}")
-        raise HTTPException(
-            status_code=400, 
-            detail="Text must be less than 1000 characters"
-        )
-
-    logger.info(f"Analyzing text from IP: {request.client.host}, length: {len(text_request.text)}")
-
-    # Check cache first
-    cache_key = get_cache_key(text_request.text.strip())
-    cached_result = get_cached_result(cache_key)
-    
-    if cached_result:
-        logger.info(f"Cache hit for text analysis")
-        return AnalysisResponse(**cached_result)
-
+def validate_text(text: str, client_host: str):
+    """Reject text outside the supported length range"""
+    with stage("validate"):
+        if len(text.strip()) < 10:
+            logger.warning(f"Text too short from IP: {client_host}")
+            raise HTTPException(
+                status_code=400, 
+                detail="Text must be at least 10 characters long"
+            )
+
+        if len(text.strip()) > 1000:
+            logger.warning(f"Text too long from IP: {client_host}")
+            raise HTTPException(
+                status_code=400, 
+                detail="Text must be less than 1000 characters"
+            )
+
+def run_analysis(text: str, cache_key: str) -> dict:
+    """Analyze text with OpenAI (or the mock fallback) and cache the result"""
     # Use mock analysis if no API key, otherwise use real OpenAI
     if not GENAI_API_KEY:
         logger.info("No API key found, using mock analysis")
-        analysis_result = mock_ai_analysis(text_request.text.strip())
+        with stage("mock_analysis"):
+            analysis_result = mock_ai_analysis(text.strip())
         model_used = "mock-gpt-3.5-turbo"
     else:
         try:
@@ -259,7 +336,7 @@ async def analyze_text(request: Request, text_request: TextRequest):
             - "summary": a one-sentence summary of the text
             - "confidence": a number between 0 and 1 indicating analysis confidence
 
-            Text: {text_request.text}
+            Text: {text}
 
             Respond with valid JSON only, no other text.
             Example format:
@@ -283,26 +360,28 @@ async def analyze_text(request: Request, text_request: TextRequest):
                 "max_tokens": 500
             }
 
-            response = requests.post(GENAI_URL, json=data, headers=headers)
-            response.raise_for_status()
-            
-            ai_content = response.json()['choices'][0]['message']['content'].strip()
+            with stage("upstream"):
+                response = requests.post(GENAI_URL, json=data, headers=headers, timeout=GENAI_TIMEOUT_SECONDS)
+                response.raise_for_status()
             
-            # Parse the JSON response from AI
-            analysis_result = json.loads(ai_content)
+            with stage("parse"):
+                ai_content = response.json()['choices'][0]['message']['content'].strip()
+                
+                # Parse the JSON response from AI
+                analysis_result = json.loads(ai_content)
             model_used = "gpt-3.5-turbo"
             
         except requests.exceptions.RequestException as e:
             logger.error(f"OpenAI API error: {str(e)}, falling back to mock analysis")
-            analysis_result = mock_ai_analysis(text_request.text.strip())
+            analysis_result = mock_ai_analysis(text.strip())
             model_used = "mock-gpt-3.5-turbo (fallback)"
         except json.JSONDecodeError as e:
             logger.error(f"JSON parsing error: {str(e)}, falling back to mock analysis")
-            analysis_result = mock_ai_analysis(text_request.text.strip())
+            analysis_result = mock_ai_analysis(text.strip())
             model_used = "mock-gpt-3.5-turbo (fallback)"
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}, falling back to mock analysis")
-            analysis_result = mock_ai_analysis(text_request.text.strip())
+            analysis_result = mock_ai_analysis(text.strip())
             model_used = "mock-gpt-3.5-turbo (fallback)"
 
     logger.info(f"Successfully analyzed text. Sentiment: {analysis_result.get('sentiment')}")
@@ -319,45 +398,223 @@ async def analyze_text(request: Request, text_request: TextRequest):
     
     # Cache the result (no expiration)
     set_cached_result(cache_key, result_data)
+
+    try:
+        get_analytics().record(result_data)
+    except Exception as e:
+        logger.warning(f"Analytics update error: {e}")
+
+    return result_data
+
+@app.get("/health", response_model=HealthResponse)
+@limiter.limit("30/minute")
+async def health_check(request: Request):
+    """Health check endpoint for deployment monitoring"""
+    redis_status = "connected" if redis_client and redis_client.ping() else "disconnected"
     
-    return AnalysisResponse(**result_data)
+    return HealthResponse(
+        status="healthy",
+        message="GenAI Text Analyzer API is running successfully!",
+        timestamp=datetime.datetime.utcnow().isoformat(),
+        version="1.0.0",
+        redis_status=redis_status
+    )
+
+@app.get("/cache/stats", response_model=CacheStatsResponse)
+@limiter.limit("30/minute")
+async def get_cache_stats(request: Request):
+    """Get cache statistics"""
+    total = cache_stats["hits"] + cache_stats["misses"]
+    hit_rate = cache_stats["hits"] / total if total > 0 else 0
+    
+    return CacheStatsResponse(
+        total_requests=total,
+        cache_hits=cache_stats["hits"],
+        cache_misses=cache_stats["misses"],
+        hit_rate=round(hit_rate, 2)
+    )
+
+@app.post("/analyze", response_model=AnalysisResponse, responses=MSGPACK_RESPONSES)
+@limiter.limit("10/minute")  # 10 requests per minute per IP
+async def analyze_text(request: Request, text_request: TextRequest):
+    """
+    Analyze text for sentiment, key phrases, and generate a summary.
+    
+    - **text**: The input text to analyze (min 10 characters, max 1000 characters)
+    """
+    # Time spent receiving and parsing the request body before we got here
+    record_since_start("request")
+
+    # Input validation
+    validate_text(text_request.text, request.client.host)
+
+    logger.info(f"Analyzing text from IP: {request.client.host}, length: {len(text_request.text)}")
+
+    # Check cache first
+    with stage("cache_key"):
+        cache_key = get_cache_key(text_request.text.strip())
+    cached_result = get_cached_result(cache_key)
+    
+    if cached_result:
+        logger.info(f"Cache hit for text analysis")
+        return render_analysis(request, cached_result)
+
+    result_data = run_analysis(text_request.text, cache_key)
+    
+    return render_analysis(request, result_data)
+
+@app.post("/analyze/jobs", response_model=JobResponse, status_code=202,
+          responses={202: MSGPACK_RESPONSES[200]})
+@limiter.limit("10/minute")
+async def submit_analysis_job(request: Request, text_request: TextRequest):
+    """
+    Queue text for asynchronous analysis and return a job ID right away.
+    
+    Poll **GET** `/analyze/jobs/{job_id}` for the result.
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Job queue requires Redis")
+
+    validate_text(text_request.text, request.client.host)
+
+    # Already analyzed texts complete immediately without going through a worker
+    cached_result = get_cached_result(get_cache_key(text_request.text.strip()))
+
+    try:
+        job_id = create_job(redis_client, text_request.text, result=cached_result)
+    except redis.RedisError as e:
+        logger.error(f"Job submission error: {e}")
+        raise HTTPException(status_code=503, detail="Job queue unavailable")
+
+    logger.info(f"Queued analysis job {job_id} from IP: {request.client.host}")
+    job = JobResponse(job_id=job_id, status="completed" if cached_result else "queued",
+                      result=cached_result)
+    return render(request, job, status_code=202)
+
+@app.get("/analyze/jobs/{job_id}", response_model=JobResponse, responses=MSGPACK_RESPONSES)
+@limiter.limit("120/minute")
+async def get_analysis_job(request: Request, job_id: str,
+                            wait: float = Query(0, ge=0, le=MAX_JOB_WAIT_SECONDS)):
+    """
+    Get the status of an analysis job.
+    
+    - **wait**: seconds to long-poll for the job to finish (max 30)
+    """
+    if not redis_client:
+        raise HTTPException(status_code=503, detail="Job queue requires Redis")
+
+    deadline = asyncio.get_event_loop().time() + wait
+    poll_interval = 0.05
+    while True:
+        try:
+            job = get_job(redis_client, job_id)
+        except redis.RedisError as e:
+            logger.error(f"Job lookup error: {e}")
+            raise HTTPException(status_code=503, detail="Job queue unavailable")
+
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job["status"] in FINISHED_STATUSES or asyncio.get_event_loop().time() >= deadline:
+            break
+        await asyncio.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, 0.5)
+
+    return render(request, JobResponse(
+        job_id=job_id,
+        status=job["status"],
+        attempts=job["attempts"],
+        result=job["result"],
+        error=job.get("error")
+    ))
 
 @app.delete("/cache/clear")
 @limiter.limit("5/minute")
 async def clear_cache(request: Request):
     """Clear all cached results"""
-    if not redis_client:
-        raise HTTPException(status_code=500, detail="Redis not available")
+    if not redis_client and not disk_cache:
+        raise HTTPException(status_code=500, detail="No cache available")
     
     try:
+        cleared = 0
         # Clear all cache keys starting with "analysis:"
-        keys = redis_client.keys("analysis:*")
-        if keys:
-            redis_client.delete(*keys)
-        logger.info(f"Cleared {len(keys)} cached items")
-        return {"message": f"Cleared {len(keys)} cached items"}
+        if redis_client:
+            keys = redis_client.keys("analysis:*")
+            if keys:
+                redis_client.delete(*keys)
+            cleared += len(keys)
+        if disk_cache:
+            cleared += disk_cache.delete_prefix("analysis:")
+        logger.info(f"Cleared {cleared} cached items")
+        return {"message": f"Cleared {cleared} cached items"}
     except Exception as e:
         logger.error(f"Cache clear error: {e}")
         raise HTTPException(status_code=500, detail=f"Error clearing cache: {e}")
 
+@app.get("/analytics/summary", response_model=AnalyticsResponse)
+@limiter.limit("30/minute")
+async def get_analytics_summary(request: Request, window: str = "hour", top: int = 10):
+    """
+    Get precomputed analytics over recent analyses.
+    
+    - **window**: `hour` or `day` - sentiment and confidence cover the last hour or 24 hours,
+      top key phrases cover the current UTC hour or day
+    - **top**: number of top key phrases to return (max 50)
+    """
+    if window not in WINDOWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"window must be one of: {', '.join(WINDOWS)}"
+        )
+
+    try:
+        summary = get_analytics().summary(window, top_n=min(max(top, 1), 50))
+    except redis.RedisError as e:
+        logger.error(f"Analytics read error: {e}")
+        raise HTTPException(status_code=503, detail="Analytics unavailable")
+
+    return AnalyticsResponse(**summary)
+
+@app.get("/metrics/stages", response_model=StageStatsResponse)
+@limiter.limit("30/minute")
+async def get_stage_stats(request: Request):
+    """Get rolling p50/p95/p99 latency for each request stage"""
+    return StageStatsResponse(stages=stage_percentiles())
+
+@app.post("/debug/profile")
+@limiter.limit("5/minute")
+async def start_profile_window(request: Request, seconds: float = Query(30, gt=0, le=MAX_PROFILE_SECONDS)):
+    """Sample the event loop thread for a time window and write a flamegraph-compatible profile"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+
+    profiler = SamplingProfiler(threading.get_ident(), output_dir=PROFILE_DIR)
+    profiler.start(duration=seconds)
+    logger.info(f"Profiling event loop for {seconds}s, writing to {profiler.path}")
+    return {"message": f"Profiling for {seconds} seconds", "output": profiler.path}
+
 @app.get("/")
 @limiter.limit("30/minute")
 async def root(request: Request):
     """Root endpoint with API information"""
     redis_status = "connected" if redis_client and redis_client.ping() else "disconnected"
+    disk_cache_status = "enabled" if disk_cache else "disabled"
     api_mode = "Mock Mode" if not GENAI_API_KEY else "OpenAI Mode"
     
     return {
         "message": f"GenAI Text Analyzer API with Redis Caching ({api_mode})",
         "version": "1.0.0",
         "redis_status": redis_status,
+        "disk_cache_status": disk_cache_status,
         "api_mode": api_mode,
         "endpoints": {
             "docs": "/docs",
             "health": "/health",
             "analyze": "/analyze",
+            "analyze_jobs": "/analyze/jobs",
             "cache_stats": "/cache/stats",
-            "clear_cache": "/cache/clear"
+            "analytics": "/analytics/summary",
+            "clear_cache": "/cache/clear",
+            "stage_stats": "/metrics/stages"
         },
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
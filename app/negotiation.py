@@ -0,0 +1,96 @@
+from typing import Callable
+import msgpack
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+JSON_MEDIA_TYPE = "application/json"
+
+# OpenAPI documentation for endpoints that can answer in msgpack
+MSGPACK_RESPONSES = {200: {"content": {MSGPACK_MEDIA_TYPE: {}}}}
+
+
+def is_msgpack(content_type: str) -> bool:
+    """Check whether a Content-Type header names msgpack"""
+    if not content_type:
+        return False
+    return content_type.split(";", 1)[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def wants_msgpack(request: Request) -> bool:
+    """Check whether the Accept header prefers msgpack over JSON (JSON wins ties and is the default)"""
+    accept = request.headers.get("accept")
+    if not accept or "msgpack" not in accept:
+        return False
+
+    best_json = best_msgpack = 0.0
+    for media_range in accept.split(","):
+        media_type, _, params = media_range.partition(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            best_msgpack = max(best_msgpack, quality)
+        elif media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            best_json = max(best_json, quality)
+    return best_msgpack > best_json
+
+
+def _pack_default(obj):
+    # Pack pydantic models straight from their field storage instead of building a dict copy
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to msgpack")
+
+
+def render(request: Request, model: BaseModel, status_code: int = 200) -> Response:
+    """Serialize a response model as msgpack or JSON depending on the Accept header"""
+    # The body depends on Accept, so caches must not serve one format for the other
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(request):
+        return Response(
+            content=msgpack.packb(model.__dict__, default=_pack_default),
+            status_code=status_code,
+            headers=headers,
+            media_type=MSGPACK_MEDIA_TYPE
+        )
+    return Response(
+        content=model.model_dump_json(), status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE
+    )
+
+
+class MsgpackRoute(APIRoute):
+    """
+    Route that also accepts msgpack request bodies. The body is decoded once and
+    handed to FastAPI's normal JSON body handling, so validation is unchanged.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if is_msgpack(request.headers.get("content-type")):
+                body = await request.body()
+                try:
+                    payload = msgpack.unpackb(body, raw=False)
+                except (ValueError, TypeError, msgpack.UnpackException) as e:
+                    raise HTTPException(status_code=400, detail=f"Invalid msgpack body: {e}")
+
+                # Present the decoded payload as an already parsed JSON body
+                headers = [(k, v) for k, v in request.scope["headers"] if k != b"content-type"]
+                headers.append((b"content-type", JSON_MEDIA_TYPE.encode()))
+                request = Request({**request.scope, "headers": headers}, request.receive)
+                request._body = body
+                request._json = payload
+
+            return await original_handler(request)
+
+        return route_handler
@@ -0,0 +1,200 @@
+import os
+import sys
+import math
+import time
+import datetime
+import threading
+import contextvars
+from collections import Counter, deque
+from contextlib import contextmanager
+from starlette.datastructures import MutableHeaders
+
+# Per-request stage timings, set by the timing middleware in app.main
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+# Rolling window of recent durations (in milliseconds) per stage
+STAGE_WINDOW_SIZE = int(os.getenv("STAGE_WINDOW_SIZE", "1024"))
+stage_samples = {}
+_stage_lock = threading.Lock()
+
+
+def start_request_timings() -> dict:
+    """Start collecting stage timings for the current request"""
+    timings = {"_start": time.perf_counter(), "stages": []}
+    current_timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, duration_ms: float):
+    """Record a stage duration for the current request and the rolling stats"""
+    timings = current_timings.get()
+    if timings is not None:
+        timings["stages"].append((name, duration_ms))
+
+    with _stage_lock:
+        samples = stage_samples.get(name)
+        if samples is None:
+            samples = stage_samples[name] = deque(maxlen=STAGE_WINDOW_SIZE)
+        samples.append(duration_ms)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block of code as a named stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, (time.perf_counter() - start) * 1000)
+
+
+def record_since_start(name: str):
+    """Record the time elapsed since the request started as a stage"""
+    timings = current_timings.get()
+    if timings is not None:
+        record_stage(name, (time.perf_counter() - timings["_start"]) * 1000)
+
+
+def server_timing_header(timings: dict) -> str:
+    """Format collected stage timings as a Server-Timing header value"""
+    entries = [f"{name};dur={duration:.2f}" for name, duration in timings["stages"]]
+    total = (time.perf_counter() - timings["_start"]) * 1000
+    entries.append(f"total;dur={total:.2f}")
+    return ", ".join(entries)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def stage_percentiles() -> dict:
+    """Get p50/p95/p99 for every stage over the rolling window"""
+    with _stage_lock:
+        snapshot = {name: sorted(samples) for name, samples in stage_samples.items()}
+
+    stats = {}
+    for name, values in snapshot.items():
+        if not values:
+            continue
+        stats[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50), 3),
+            "p95_ms": round(percentile(values, 95), 3),
+            "p99_ms": round(percentile(values, 99), 3),
+            "max_ms": round(values[-1], 3),
+        }
+    return stats
+
+
+def reset_stage_stats():
+    """Clear all rolling stage samples"""
+    with _stage_lock:
+        stage_samples.clear()
+
+
+class SamplingProfiler:
+    """
+    Periodically samples the stack of one thread and aggregates the samples
+    in collapsed-stack format ("frame;frame;frame count"), which flamegraph.pl,
+    speedscope and inferno can render directly.
+
+    Note that the event loop thread is shared by all in-flight requests, so a
+    profile covers whatever the thread was doing, not just a single request.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, output_dir: str = "profiles"):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.output_dir = output_dir
+        self.samples = Counter()
+        self.path = os.path.join(
+            output_dir, f"profile-{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}.folded"
+        )
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self, duration):
+        deadline = time.monotonic() + duration if duration else None
+        while not self._stop_event.wait(self.interval):
+            self._sample()
+            if deadline and time.monotonic() >= deadline:
+                break
+        if duration:
+            self.write()
+
+    def start(self, duration: float = None):
+        """Start sampling; when a duration is given the profile is written automatically"""
+        self._thread = threading.Thread(target=self._run, args=(duration,), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and write the collapsed stacks to disk"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        return self.write()
+
+    def collapsed(self) -> str:
+        """Render samples in collapsed-stack format"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.items())
+
+    def write(self) -> str:
+        """Write collapsed stacks to the output directory and return the path"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.path, "w") as f:
+            f.write(self.collapsed())
+            f.write("\n")
+        return self.path
+
+
+class ServerTimingMiddleware:
+    """
+    Plain ASGI middleware that starts stage timing for each HTTP request and adds
+    the Server-Timing header when the response starts. `profiler_factory` is
+    called with the scope and may return a SamplingProfiler to run for the request.
+    """
+
+    def __init__(self, app, profiler_factory=None):
+        self.app = app
+        self.profiler_factory = profiler_factory
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request_timings()
+        profiler = self.profiler_factory(scope) if self.profiler_factory else None
+        if profiler:
+            profiler.start()
+
+        async def send_with_timing(message):
+            nonlocal profiler
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if profiler:
+                    headers.append("X-Profile-Output", profiler.stop())
+                    profiler = None
+                headers.append("Server-Timing", server_timing_header(timings))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if profiler:
+                profiler.stop()
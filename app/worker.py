@@ -0,0 +1,167 @@
+"""
+Worker processes for the asynchronous job API.
+
+Run with: python -m app.worker --workers 4
+"""
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import datetime
+import threading
+import multiprocessing
+from contextlib import contextmanager
+import redis
+
+from app import main
+from app.jobs import (
+    DEAD_LETTER_STREAM,
+    FINISHED_STATUSES,
+    JOB_CLAIM_IDLE_MS,
+    JOB_GROUP,
+    JOB_MAX_ATTEMPTS,
+    JOB_STREAM,
+    ensure_group,
+    get_job,
+    job_key,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def dead_letter_job(client: redis.Redis, message_id, job_id: str, error: str):
+    """Mark a job as failed, move it to the dead-letter stream and acknowledge it"""
+    now = datetime.datetime.utcnow().isoformat()
+    pipe = client.pipeline()
+    pipe.xadd(DEAD_LETTER_STREAM, {"job_id": job_id, "error": error, "failed_at": now})
+    pipe.hset(job_key(job_id), mapping={"status": "failed", "error": error, "finished_at": now})
+    pipe.xack(JOB_STREAM, JOB_GROUP, message_id)
+    pipe.execute()
+    logger.error(f"Job {job_id} moved to dead-letter queue: {error}")
+
+
+@contextmanager
+def claim_heartbeat(client: redis.Redis, consumer: str, message_id):
+    """Keep re-claiming a message while its job runs so other workers don't treat it as stalled"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(JOB_CLAIM_IDLE_MS / 3000):
+            try:
+                client.xclaim(JOB_STREAM, JOB_GROUP, consumer, 0, [message_id], justid=True)
+            except redis.RedisError as e:
+                logger.warning(f"Could not refresh claim on {message_id}: {e}")
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def process_job(client: redis.Redis, consumer: str, message_id, job_id: str):
+    """Run the analysis for one job and acknowledge it once the result is stored"""
+    job = get_job(client, job_id)
+    if job is None or job["status"] in FINISHED_STATUSES:
+        # Expired or already handled by another worker
+        client.xack(JOB_STREAM, JOB_GROUP, message_id)
+        return
+
+    attempts = client.hincrby(job_key(job_id), "attempts", 1)
+    if attempts > JOB_MAX_ATTEMPTS:
+        dead_letter_job(client, message_id, job_id, job.get("error") or "Exceeded maximum attempts")
+        return
+
+    client.hset(job_key(job_id), mapping={
+        "status": "running",
+        "started_at": datetime.datetime.utcnow().isoformat()
+    })
+
+    try:
+        with claim_heartbeat(client, consumer, message_id):
+            text = job["text"]
+            cache_key = main.get_cache_key(text.strip())
+            result = main.get_cached_result(cache_key) or main.run_analysis(text, cache_key)
+    except Exception as e:
+        # Leave the message pending so it is reclaimed and retried after JOB_CLAIM_IDLE_MS
+        logger.error(f"Job {job_id} failed on attempt {attempts}: {e}")
+        client.hset(job_key(job_id), mapping={"status": "queued", "error": str(e)})
+        return
+
+    pipe = client.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "status": "completed",
+        "result": json.dumps(result),
+        "finished_at": datetime.datetime.utcnow().isoformat()
+    })
+    pipe.xack(JOB_STREAM, JOB_GROUP, message_id)
+    pipe.execute()
+    logger.info(f"Job {job_id} completed. Sentiment: {result.get('sentiment')}")
+
+
+def process_batch(client: redis.Redis, consumer: str, block_ms: int = 5000, count: int = 10) -> int:
+    """Reclaim stalled jobs or read new ones, process them and return how many were handled"""
+    # Jobs left pending by a crashed or failing worker come first
+    claimed = client.xautoclaim(JOB_STREAM, JOB_GROUP, consumer, JOB_CLAIM_IDLE_MS, "0-0", count=count)
+    messages = [message for message in claimed[1] if message and message[1]]
+
+    if not messages:
+        response = client.xreadgroup(JOB_GROUP, consumer, {JOB_STREAM: ">"}, count=count, block=block_ms)
+        for _, stream_messages in response or []:
+            messages.extend(stream_messages)
+
+    for message_id, fields in messages:
+        job_id = fields.get(b"job_id", fields.get("job_id"))
+        if isinstance(job_id, bytes):
+            job_id = job_id.decode()
+        process_job(client, consumer, message_id, job_id)
+    return len(messages)
+
+
+def run_worker(consumer: str = None):
+    """Consume jobs forever"""
+    client = main.redis_client
+    if client is None:
+        logger.error("❌ Workers need Redis, but no Redis connection is available")
+        sys.exit(1)
+
+    consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+    ensure_group(client)
+    logger.info(f"Worker {consumer} consuming from {JOB_STREAM}")
+
+    while True:
+        try:
+            process_batch(client, consumer)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            logger.warning(f"Redis connection error in worker {consumer}: {e}")
+            time.sleep(1)
+
+
+def run_pool(workers: int):
+    """Start a pool of worker processes and wait for them"""
+    processes = [multiprocessing.Process(target=run_worker, daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run analysis job workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker()
+    else:
+        run_pool(args.workers)
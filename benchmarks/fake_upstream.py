@@ -0,0 +1,95 @@
+"""
+Local stand-in for the OpenAI chat-completions API with configurable latency,
+error rate and 429 behaviour.
+
+Run standalone with: python -m benchmarks.fake_upstream --port 9000 --latency-ms 50
+"""
+import json
+import random
+import asyncio
+import argparse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+# Mutable so a benchmark can change behaviour between scenarios without restarting
+upstream_config = {
+    "latency_ms": 50.0,
+    "jitter_ms": 10.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "retry_after": 1,
+}
+
+app = FastAPI(title="Fake chat-completions upstream")
+
+_rng = random.Random()
+
+
+def configure(**settings):
+    """Update the upstream behaviour"""
+    unknown = set(settings) - set(upstream_config)
+    if unknown:
+        raise ValueError(f"Unknown upstream settings: {', '.join(sorted(unknown))}")
+    upstream_config.update(settings)
+
+
+def _fake_analysis(text: str) -> dict:
+    words = [word.strip(".,!?").lower() for word in text.split() if len(word) > 3]
+    key_phrases = (words + ["topic1", "topic2", "topic3"])[:3]
+    return {
+        "sentiment": _rng.choice(["positive", "negative", "neutral"]),
+        "key_phrases": key_phrases,
+        "summary": f"A text about {', '.join(key_phrases[:2])}.",
+        "confidence": round(_rng.uniform(0.5, 0.99), 2),
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Mimic the chat-completions response shape the analyzer parses"""
+    body = await request.json()
+
+    latency = upstream_config["latency_ms"] + _rng.uniform(-1, 1) * upstream_config["jitter_ms"]
+    await asyncio.sleep(max(latency, 0) / 1000)
+
+    roll = _rng.random()
+    if roll < upstream_config["rate_limit_rate"]:
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+            headers={"Retry-After": str(upstream_config["retry_after"])}
+        )
+    if roll < upstream_config["rate_limit_rate"] + upstream_config["error_rate"]:
+        return JSONResponse(
+            status_code=500,
+            content={"error": {"message": "Internal server error", "type": "server_error"}}
+        )
+
+    prompt = body["messages"][-1]["content"]
+    text = prompt.split("Text:", 1)[-1].split("Respond with", 1)[0].strip()
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "model": body.get("model", "gpt-3.5-turbo"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": json.dumps(_fake_analysis(text))},
+            "finish_reason": "stop"
+        }],
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run the fake chat-completions upstream")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=upstream_config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=upstream_config["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=upstream_config["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=upstream_config["rate_limit_rate"])
+    args = parser.parse_args()
+
+    configure(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+              error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
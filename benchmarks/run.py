@@ -0,0 +1,325 @@
+"""
+Load-testing benchmark suite.
+
+Starts the analyzer and a fake chat-completions upstream on local ports, drives
+each scenario at the configured concurrency and cache hit ratio, and reports
+throughput, p50/p95/p99 latency and how many analyses fell back to the mock
+model (the API answers upstream failures with a 200 fallback result).
+
+Usage:
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario analyze_cold --requests 500 --concurrency 32
+    python -m benchmarks.run --output bench.json --thresholds benchmarks/thresholds.json
+    python -m benchmarks.run --output bench.json --max-p99-ms 500 --max-error-rate 0.01 --max-fallback-rate 0
+
+A thresholds file holds "default" limits and per-scenario overrides under
+"scenarios"; --max-* flags apply to every scenario and take precedence.
+"""
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import threading
+from collections import Counter
+
+import httpx
+import msgpack
+import uvicorn
+
+from app import main
+from app.profiling import percentile
+from benchmarks import fake_upstream
+
+# Each scenario drives one endpoint; "upstream" overrides the fake upstream behaviour
+# and "format" selects JSON (default) or msgpack request and response bodies
+SCENARIOS = [
+    {"name": "analyze_cold", "method": "POST", "path": "/analyze", "hit_ratio": 0.0,
+     "upstream": {"latency_ms": 20.0}},
+    {"name": "analyze_hot", "method": "POST", "path": "/analyze", "hit_ratio": 0.9,
+     "upstream": {"latency_ms": 20.0}},
+    {"name": "analyze_hot_msgpack", "method": "POST", "path": "/analyze", "hit_ratio": 0.9,
+     "format": "msgpack", "upstream": {"latency_ms": 20.0}},
+    {"name": "analyze_upstream_errors", "method": "POST", "path": "/analyze", "hit_ratio": 0.0,
+     "upstream": {"latency_ms": 20.0, "error_rate": 0.2, "rate_limit_rate": 0.1}},
+    {"name": "analyze_slow_upstream", "method": "POST", "path": "/analyze", "hit_ratio": 0.5,
+     "upstream": {"latency_ms": 200.0, "jitter_ms": 50.0}},
+    {"name": "jobs_submit", "method": "POST", "path": "/analyze/jobs", "hit_ratio": 0.5,
+     "upstream": {"latency_ms": 20.0}},
+    {"name": "health", "method": "GET", "path": "/health"},
+    {"name": "analytics_summary", "method": "GET", "path": "/analytics/summary?window=hour"},
+]
+
+DEFAULT_UPSTREAM = dict(fake_upstream.upstream_config)
+HOT_SET_SIZE = 20
+THRESHOLD_KEYS = ("max_p99_ms", "max_error_rate", "max_fallback_rate", "min_fallback_rate")
+
+
+class ServerThread(threading.Thread):
+    """Run a uvicorn server on a background thread"""
+
+    def __init__(self, app, port: int):
+        super().__init__(daemon=True)
+        config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        self.server = uvicorn.Server(config)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def run(self):
+        self.server.run()
+
+    def wait_started(self, timeout: float = 10):
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Server at {self.url} did not start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.join()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_bodies(scenario: dict, total: int, rng: random.Random):
+    """Build request bodies so that roughly hit_ratio of them repeat an already cached text"""
+    if scenario["method"] != "POST":
+        return [None] * total, []
+
+    run_id = uuid.uuid4().hex[:8]
+    adjectives = ["great", "terrible", "reliable", "confusing", "amazing", "slow", "excellent", "awful"]
+    hot = [
+        {"text": f"Hot benchmark text {run_id}-{i}: the service was {adjectives[i % len(adjectives)]} today."}
+        for i in range(HOT_SET_SIZE)
+    ]
+    bodies = []
+    for i in range(total):
+        if rng.random() < scenario.get("hit_ratio", 0.0):
+            bodies.append(rng.choice(hot))
+        else:
+            adjective = rng.choice(adjectives)
+            bodies.append({"text": f"Cold benchmark text {run_id}-{i}: the product felt {adjective} to use."})
+    return bodies, hot if scenario.get("hit_ratio") else []
+
+
+async def send(client: httpx.AsyncClient, scenario: dict, body) -> httpx.Response:
+    """Send one request in the scenario's wire format"""
+    if scenario.get("format") == "msgpack" and body is not None:
+        return await client.request(
+            scenario["method"], scenario["path"], content=msgpack.packb(body),
+            headers={"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+        )
+    return await client.request(scenario["method"], scenario["path"], json=body)
+
+
+def model_used(response: httpx.Response):
+    """The model_used of an analysis (or completed job) response, None for other responses"""
+    if not response.is_success:
+        return None
+    if response.headers.get("content-type", "").startswith("application/msgpack"):
+        body = msgpack.unpackb(response.content)
+    else:
+        body = response.json()
+    if isinstance(body, dict) and isinstance(body.get("result"), dict):
+        body = body["result"]
+    return body.get("model_used") if isinstance(body, dict) else None
+
+
+async def drive(base_url: str, scenario: dict, bodies: list, warmup: list, concurrency: int) -> dict:
+    """Send all requests for a scenario with a fixed number of concurrent clients"""
+    latencies = []
+    statuses = Counter()
+    models = Counter()
+    pending = iter(bodies)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        # Populate the cache with the hot set so repeats are real cache hits
+        for body in warmup:
+            await send(client, scenario, body)
+
+        async def worker():
+            for body in pending:
+                start = time.perf_counter()
+                try:
+                    response = await send(client, scenario, body)
+                except httpx.HTTPError:
+                    statuses["transport_error"] += 1
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[response.status_code] += 1
+                models[model_used(response)] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items()
+                 if status == "transport_error" or not 200 <= status < 300)
+    fallbacks = sum(count for model, count in models.items() if model and "fallback" in model)
+    return {
+        "scenario": scenario["name"],
+        "requests": len(bodies),
+        "concurrency": concurrency,
+        "hit_ratio": scenario.get("hit_ratio"),
+        "format": scenario.get("format", "json"),
+        "throughput_rps": round(len(bodies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "error_rate": round(errors / len(bodies), 4) if bodies else 0.0,
+        "fallbacks": fallbacks,
+        "fallback_rate": round(fallbacks / len(bodies), 4) if bodies else 0.0,
+        "statuses": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def configure_app(upstream_url: str, redis_url: str = None, disk_cache_path: str = None):
+    """Point the analyzer at the fake upstream and the chosen cache backends"""
+    import redis
+
+    main.limiter.enabled = False
+    main.GENAI_API_KEY = "benchmark-key"
+    main.GENAI_URL = f"{upstream_url}/v1/chat/completions"
+
+    if redis_url:
+        main.redis_client = redis.Redis.from_url(redis_url, decode_responses=False)
+        main.redis_client.ping()
+    else:
+        import fakeredis
+        main.redis_client = fakeredis.FakeRedis()
+
+    if disk_cache_path:
+        from app.disk_cache import DiskCache
+        main.disk_cache = DiskCache(disk_cache_path)
+    else:
+        main.disk_cache = None
+
+
+def print_report(results: list):
+    header = (f"{'scenario':<26}{'reqs':>6}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              f"{'errors':>9}{'fallback':>10}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['scenario']:<26}{r['requests']:>6}{r['concurrency']:>6}{r['throughput_rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['error_rate']:>9.1%}"
+              f"{r['fallback_rate']:>10.1%}")
+
+
+def run(args) -> list:
+    selected = [s for s in SCENARIOS if not args.scenario or s["name"] in args.scenario]
+    if not selected:
+        raise SystemExit(f"No scenarios match: {', '.join(args.scenario)}")
+
+    upstream = ServerThread(fake_upstream.app, free_port())
+    upstream.start()
+    upstream.wait_started()
+
+    configure_app(upstream.url, args.redis_url, args.disk_cache)
+    analyzer = ServerThread(main.app, free_port())
+    analyzer.start()
+    analyzer.wait_started()
+
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        for scenario in selected:
+            fake_upstream.configure(**{**DEFAULT_UPSTREAM, **scenario.get("upstream", {})})
+            bodies, warmup = make_bodies(scenario, args.requests, rng)
+            result = asyncio.run(drive(analyzer.url, scenario, bodies, warmup, args.concurrency))
+            results.append(result)
+    finally:
+        analyzer.stop()
+        upstream.stop()
+    return results
+
+
+def load_thresholds(path: str) -> dict:
+    """Read a thresholds file, rejecting unknown limits so typos don't silently disable a check"""
+    with open(path) as f:
+        thresholds = json.load(f)
+    for name, limits in [("default", thresholds.get("default", {})), *thresholds.get("scenarios", {}).items()]:
+        unknown = set(limits) - set(THRESHOLD_KEYS)
+        if unknown:
+            raise SystemExit(f"Unknown thresholds for {name} in {path}: {', '.join(sorted(unknown))}")
+    return thresholds
+
+
+def check_thresholds(results: list, thresholds: dict = None, **overrides) -> list:
+    """
+    Return a description of every scenario that breaks a threshold.
+
+    Limits come from the thresholds' "default" entry, then the scenario's own
+    entry, then any keyword overrides (which apply to every scenario).
+    """
+    thresholds = thresholds or {}
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    failures = []
+    for r in results:
+        limits = {
+            **thresholds.get("default", {}),
+            **thresholds.get("scenarios", {}).get(r["scenario"], {}),
+            **overrides,
+        }
+        max_p99_ms = limits.get("max_p99_ms")
+        max_error_rate = limits.get("max_error_rate")
+        max_fallback_rate = limits.get("max_fallback_rate")
+        min_fallback_rate = limits.get("min_fallback_rate")
+        if max_p99_ms is not None and r["p99_ms"] > max_p99_ms:
+            failures.append(f"{r['scenario']}: p99 {r['p99_ms']}ms > {max_p99_ms}ms")
+        if max_error_rate is not None and r["error_rate"] > max_error_rate:
+            failures.append(f"{r['scenario']}: error rate {r['error_rate']:.2%} > {max_error_rate:.2%}")
+        if max_fallback_rate is not None and r["fallback_rate"] > max_fallback_rate:
+            failures.append(f"{r['scenario']}: fallback rate {r['fallback_rate']:.2%} > {max_fallback_rate:.2%}")
+        if min_fallback_rate is not None and r["fallback_rate"] < min_fallback_rate:
+            failures.append(f"{r['scenario']}: fallback rate {r['fallback_rate']:.2%} < {min_fallback_rate:.2%}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the GenAI Text Analyzer API")
+    parser.add_argument("--scenario", action="append",
+                        help=f"Scenario to run (repeatable): {', '.join(s['name'] for s in SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--redis-url", help="Use a real Redis instead of the in-memory stand-in")
+    parser.add_argument("--disk-cache", help="Enable the disk cache tier at this path")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--thresholds", help="JSON file of default and per-scenario thresholds")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if any scenario's p99 exceeds this")
+    parser.add_argument("--max-error-rate", type=float, help="Fail if any scenario's error rate exceeds this")
+    parser.add_argument("--max-fallback-rate", type=float,
+                        help="Fail if any scenario's share of mock fallback analyses exceeds this")
+    args = parser.parse_args()
+    thresholds = load_thresholds(args.thresholds) if args.thresholds else None
+
+    # Per-request logging (including upstream error fallbacks) would dominate the measurements
+    logging.disable(logging.ERROR)
+
+    results = run(args)
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": time.time(), "results": results}, f, indent=2)
+
+    failures = check_thresholds(
+        results, thresholds,
+        max_p99_ms=args.max_p99_ms, max_error_rate=args.max_error_rate, max_fallback_rate=args.max_fallback_rate
+    )
+    for failure in failures:
+        print(f"❌ {failure}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,94 @@
+"""
+Compare payload size and CPU cost of JSON and msgpack for the analysis request
+and response bodies, using the same decode and render paths as the API.
+
+Usage: python -m benchmarks.serialization [--iterations 20000]
+"""
+import json
+import time
+import argparse
+
+import msgpack
+
+from starlette.requests import Request
+
+from app.main import AnalysisResponse, JobResponse, TextRequest
+from app.negotiation import render
+
+SAMPLE_TEXT = (
+    "I absolutely love this new AI technology! It is transforming how we build applications "
+    "and making developers more productive. The documentation could be better, but overall "
+    "the experience has been excellent and the support team answered every question quickly. "
+) * 3
+
+SAMPLE_RESULT = {
+    "sentiment": "positive",
+    "key_phrases": ["AI technology", "developer productivity", "excellent support"],
+    "summary": "The author is enthusiastic about a new AI technology and its support.",
+    "confidence": 0.92,
+    "model_used": "gpt-3.5-turbo",
+    "cached": True,
+}
+
+
+def cpu_time_us(func, iterations: int) -> float:
+    """Average CPU time per call in microseconds"""
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    return (time.process_time() - start) / iterations * 1_000_000
+
+
+def request_accepting(media_type: str) -> Request:
+    """Build a bare request carrying only an Accept header"""
+    return Request({"type": "http", "headers": [(b"accept", media_type.encode())]})
+
+
+def run(iterations: int) -> list:
+    request_json = json.dumps({"text": SAMPLE_TEXT}).encode()
+    request_msgpack = msgpack.packb({"text": SAMPLE_TEXT})
+    response_model = AnalysisResponse(**SAMPLE_RESULT)
+    job_model = JobResponse(job_id="0" * 32, status="completed", attempts=1, result=response_model)
+    accepts_json = request_accepting("application/json")
+    accepts_msgpack = request_accepting("application/msgpack")
+
+    cases = [
+        ("TextRequest decode",
+         request_json, lambda: TextRequest.model_validate(json.loads(request_json)),
+         request_msgpack, lambda: TextRequest.model_validate(msgpack.unpackb(request_msgpack))),
+        ("AnalysisResponse encode",
+         render(accepts_json, response_model).body, lambda: render(accepts_json, response_model),
+         render(accepts_msgpack, response_model).body, lambda: render(accepts_msgpack, response_model)),
+        ("JobResponse encode",
+         render(accepts_json, job_model).body, lambda: render(accepts_json, job_model),
+         render(accepts_msgpack, job_model).body, lambda: render(accepts_msgpack, job_model)),
+    ]
+
+    results = []
+    for name, json_payload, json_func, msgpack_payload, msgpack_func in cases:
+        results.append({
+            "case": name,
+            "json_bytes": len(json_payload),
+            "msgpack_bytes": len(msgpack_payload),
+            "json_us": round(cpu_time_us(json_func, iterations), 2),
+            "msgpack_us": round(cpu_time_us(msgpack_func, iterations), 2),
+        })
+    return results
+
+
+def print_report(results: list):
+    header = f"{'case':<26}{'json B':>9}{'msgpack B':>11}{'size':>8}{'json us':>10}{'msgpack us':>12}{'cpu':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        size_saving = 1 - r["msgpack_bytes"] / r["json_bytes"]
+        cpu_saving = 1 - r["msgpack_us"] / r["json_us"] if r["json_us"] else 0.0
+        print(f"{r['case']:<26}{r['json_bytes']:>9}{r['msgpack_bytes']:>11}{-size_saving:>8.1%}"
+              f"{r['json_us']:>10.2f}{r['msgpack_us']:>12.2f}{-cpu_saving:>8.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare JSON and msgpack serialization costs")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    print_report(run(args.iterations))
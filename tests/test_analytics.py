@@ -0,0 +1,168 @@
+import pytest
+import sys
+import os
+from collections import Counter
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import fakeredis
+from fastapi.testclient import TestClient
+from app import main, worker
+from app.analytics import AnalyticsAggregator, RedisAnalytics, SpaceSaving
+from app.jobs import ensure_group
+
+client = TestClient(main.app)
+
+# A fixed time at the start of a UTC day so hour and day boundaries are predictable
+DAY_START = 1_700_006_400
+
+def _result(sentiment, confidence, phrases):
+    return {"sentiment": sentiment, "confidence": confidence, "key_phrases": phrases}
+
+@pytest.fixture
+def fresh_app(monkeypatch):
+    """Run the app with empty analytics and no cache"""
+    monkeypatch.setattr(main, "analytics", AnalyticsAggregator())
+    monkeypatch.setattr(main, "redis_client", None)
+    monkeypatch.setattr(main, "disk_cache", None)
+    main.limiter.reset()
+    yield
+    main.limiter.reset()
+
+def test_space_saving_keeps_heavy_hitters():
+    """Test frequent items survive in a small sketch"""
+    sketch = SpaceSaving(capacity=3)
+    for i in range(100):
+        sketch.add("frequent")
+        sketch.add(f"rare{i}")
+    top = sketch.top(1)[0]
+    assert top["phrase"] == "frequent"
+    assert top["count"] - top["error"] <= 100 <= top["count"]
+
+def test_sentiment_and_confidence_aggregates():
+    """Test results are counted into the sentiment mix and confidence histogram"""
+    aggregator = AnalyticsAggregator()
+    aggregator.record(_result("positive", 0.95, ["ai"]), now=DAY_START)
+    aggregator.record(_result("positive", 0.85, ["ai"]), now=DAY_START + 10)
+    aggregator.record(_result("negative", 0.2, ["bugs"]), now=DAY_START + 20)
+
+    summary = aggregator.summary("hour", now=DAY_START + 30)
+    assert summary["total_analyses"] == 3
+    assert summary["sentiment"] == {"positive": 2, "negative": 1}
+    counts = [entry["count"] for entry in summary["confidence_histogram"]]
+    assert counts[9] == 1 and counts[8] == 1 and counts[2] == 1
+    assert summary["top_key_phrases"][0] == {"phrase": "ai", "count": 2, "error": 0}
+
+def test_old_results_slide_out_of_window():
+    """Test results older than the window are no longer counted"""
+    aggregator = AnalyticsAggregator()
+    aggregator.record(_result("negative", 0.5, []), now=DAY_START)
+    aggregator.record(_result("positive", 0.5, []), now=DAY_START + 3000)
+
+    hour = aggregator.summary("hour", now=DAY_START + 3700)
+    day = aggregator.summary("day", now=DAY_START + 3700)
+    assert hour["sentiment"] == {"positive": 1}
+    assert day["sentiment"] == {"negative": 1, "positive": 1}
+
+def test_key_phrases_reset_each_period():
+    """Test hourly key phrases start over at the next UTC hour while daily ones keep counting"""
+    aggregator = AnalyticsAggregator()
+    aggregator.record(_result("neutral", 0.5, ["Morning"]), now=DAY_START + 60)
+    aggregator.record(_result("neutral", 0.5, ["evening"]), now=DAY_START + 3660)
+
+    hour = aggregator.summary("hour", now=DAY_START + 3700)
+    day = aggregator.summary("day", now=DAY_START + 3700)
+    assert [entry["phrase"] for entry in hour["top_key_phrases"]] == ["evening"]
+    assert {entry["phrase"] for entry in day["top_key_phrases"]} == {"morning", "evening"}
+    assert day["key_phrases_analyses"] == 2
+
+def test_analytics_endpoint(fresh_app):
+    """Test new analyses show up in the analytics endpoint"""
+    client.post("/analyze", json={"text": "I love this amazing product so much."})
+    response = client.get("/analytics/summary?window=hour")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_analyses"] == 1
+    assert data["sentiment"] == {"positive": 1}
+    assert len(data["confidence_histogram"]) == 10
+
+def test_analytics_invalid_window(fresh_app):
+    """Test unknown windows are rejected"""
+    response = client.get("/analytics/summary?window=week")
+    assert response.status_code == 400
+
+def test_redis_aggregates():
+    """Test results recorded in Redis are summed over the window's buckets"""
+    analytics = RedisAnalytics(fakeredis.FakeRedis())
+    analytics.record(_result("positive", 0.95, ["AI"]), now=DAY_START)
+    analytics.record(_result("positive", 0.85, ["ai"]), now=DAY_START + 70)
+    analytics.record(_result("negative", 0.2, ["bugs"]), now=DAY_START + 3000)
+
+    summary = analytics.summary("hour", now=DAY_START + 3100)
+    assert summary["total_analyses"] == 3
+    assert summary["sentiment"] == {"positive": 2, "negative": 1}
+    counts = [entry["count"] for entry in summary["confidence_histogram"]]
+    assert counts[9] == 1 and counts[8] == 1 and counts[2] == 1
+    assert summary["top_key_phrases"][0] == {"phrase": "ai", "count": 2, "error": 0}
+    assert summary["key_phrases_analyses"] == 3
+
+    hour = analytics.summary("hour", now=DAY_START + 3700)
+    day = analytics.summary("day", now=DAY_START + 3700)
+    assert hour["sentiment"] == {"negative": 1}
+    assert hour["top_key_phrases"] == []
+    assert day["sentiment"] == {"positive": 2, "negative": 1}
+
+def test_redis_phrases_trimmed_to_capacity():
+    """Test each period's phrase set keeps only the most frequent phrases"""
+    fake = fakeredis.FakeRedis()
+    analytics = RedisAnalytics(fake, phrase_capacity=3)
+    for i in range(20):
+        analytics.record(_result("neutral", 0.5, ["frequent", f"rare{i}"]), now=DAY_START + i)
+
+    assert fake.zcard(f"stats:phrases:hour:{DAY_START}") == 3
+    top = analytics.summary("hour", now=DAY_START + 30)["top_key_phrases"]
+    assert top[0] == {"phrase": "frequent", "count": 20, "error": 0}
+
+def test_redis_late_heavy_hitter_enters_full_sketch():
+    """Test a phrase that becomes frequent after the sketch is full still reaches the top"""
+    analytics = RedisAnalytics(fakeredis.FakeRedis(), phrase_capacity=3)
+    for phrase in ("x", "y", "z"):
+        analytics.record(_result("neutral", 0.5, [phrase]), now=DAY_START)
+    for _ in range(50):
+        analytics.record(_result("neutral", 0.5, ["apple"]), now=DAY_START)
+
+    top = analytics.summary("hour", now=DAY_START)["top_key_phrases"]
+    assert len(top) == 3
+    assert top[0]["phrase"] == "apple"
+    # Same guarantee as the in-memory sketch: count - error <= true count <= count
+    assert top[0]["count"] - top[0]["error"] <= 50 <= top[0]["count"]
+
+def test_redis_sketch_error_bounds():
+    """Test every reported phrase brackets its true count like the in-memory sketch does"""
+    analytics = RedisAnalytics(fakeredis.FakeRedis(), phrase_capacity=5)
+    true_counts = Counter()
+    for i in range(60):
+        phrases = [f"p{i % 3}", f"rare{i}"]
+        true_counts.update(phrases)
+        analytics.record(_result("neutral", 0.5, phrases), now=DAY_START + i)
+
+    top = analytics.summary("hour", top_n=5, now=DAY_START + 60)["top_key_phrases"]
+    assert len(top) == 5
+    for entry in top:
+        assert entry["count"] - entry["error"] <= true_counts[entry["phrase"]] <= entry["count"]
+
+def test_worker_analyses_are_shared(fresh_app, monkeypatch):
+    """Test analyses made by a job worker show up in the API's analytics via Redis"""
+    fake = fakeredis.FakeRedis()
+    ensure_group(fake)
+    monkeypatch.setattr(main, "redis_client", fake)
+
+    client.post("/analyze/jobs", json={"text": "I love how great this queue works."})
+    assert worker.process_batch(fake, "test-worker", block_ms=None) == 1
+
+    data = client.get("/analytics/summary?window=hour").json()
+    assert data["total_analyses"] == 1
+    assert data["sentiment"] == {"positive": 1}
+    # Nothing was kept in this process's own fallback aggregator
+    assert main.analytics.summary("hour")["total_analyses"] == 0
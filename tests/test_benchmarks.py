@@ -0,0 +1,97 @@
+import pytest
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+import msgpack
+from fastapi.testclient import TestClient
+from app import profiling
+from benchmarks import fake_upstream
+from benchmarks.run import SCENARIOS, check_thresholds, load_thresholds, model_used, percentile
+
+upstream = TestClient(fake_upstream.app)
+
+CHAT_REQUEST = {
+    "model": "gpt-3.5-turbo",
+    "messages": [{"role": "user", "content": "Text: I really enjoyed this benchmark.\nRespond with valid JSON only"}]
+}
+
+@pytest.fixture(autouse=True)
+def fast_upstream():
+    """Restore the default upstream behaviour after each test"""
+    defaults = dict(fake_upstream.upstream_config)
+    fake_upstream.configure(latency_ms=0, jitter_ms=0)
+    yield
+    fake_upstream.configure(**defaults)
+
+def test_fake_upstream_returns_analysis():
+    """Test the fake upstream answers in the chat-completions format the analyzer parses"""
+    response = upstream.post("/v1/chat/completions", json=CHAT_REQUEST)
+    assert response.status_code == 200
+    content = response.json()["choices"][0]["message"]["content"]
+    assert "sentiment" in content and "key_phrases" in content
+
+def test_fake_upstream_rate_limits():
+    """Test the fake upstream can be told to return 429s"""
+    fake_upstream.configure(rate_limit_rate=1.0)
+    response = upstream.post("/v1/chat/completions", json=CHAT_REQUEST)
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+
+def test_check_thresholds():
+    """Test scenarios over the latency or error thresholds are reported"""
+    results = [
+        {"scenario": "fast", "p99_ms": 10.0, "error_rate": 0.0, "fallback_rate": 0.0},
+        {"scenario": "slow", "p99_ms": 900.0, "error_rate": 0.05, "fallback_rate": 0.3},
+    ]
+    # Shares the app's nearest-rank helper rather than keeping its own copy
+    assert percentile is profiling.percentile
+    assert percentile(list(range(1, 61)), 99) == 60
+    failures = check_thresholds(results, max_p99_ms=500, max_error_rate=0.01, max_fallback_rate=0.1)
+    assert len(failures) == 3
+    assert all(failure.startswith("slow") for failure in failures)
+
+def test_per_scenario_thresholds():
+    """Test scenario limits override the defaults and command-line limits override both"""
+    results = [
+        {"scenario": "health", "p99_ms": 200.0, "error_rate": 0.0, "fallback_rate": 0.0},
+        {"scenario": "errors", "p99_ms": 200.0, "error_rate": 0.0, "fallback_rate": 0.3},
+    ]
+    thresholds = {
+        "default": {"max_p99_ms": 1000, "max_fallback_rate": 0.0},
+        "scenarios": {
+            "health": {"max_p99_ms": 100},
+            "errors": {"min_fallback_rate": 0.1, "max_fallback_rate": 0.5},
+        },
+    }
+    assert check_thresholds(results, thresholds) == ["health: p99 200.0ms > 100ms"]
+    assert check_thresholds(results, thresholds, max_p99_ms=500) == []
+    results[1]["fallback_rate"] = 0.0
+    assert check_thresholds(results, thresholds, max_p99_ms=500) == ["errors: fallback rate 0.00% < 10.00%"]
+
+def test_committed_thresholds_cover_every_scenario():
+    """Test the CI thresholds file is valid and sets a latency budget for each scenario"""
+    thresholds = load_thresholds(os.path.join(os.path.dirname(__file__), "..", "benchmarks", "thresholds.json"))
+    for scenario in SCENARIOS:
+        assert "max_p99_ms" in thresholds["scenarios"][scenario["name"]]
+
+def test_unknown_threshold_rejected(tmp_path):
+    """Test a misspelled limit fails loudly instead of being ignored"""
+    path = tmp_path / "thresholds.json"
+    path.write_text('{"scenarios": {"health": {"max_p99": 100}}}')
+    with pytest.raises(SystemExit):
+        load_thresholds(str(path))
+
+def test_model_used_detects_fallbacks():
+    """Test fallback analyses are recognised even though the API answers them with 200"""
+    fallback = {"model_used": "mock-gpt-3.5-turbo (fallback)"}
+    assert model_used(httpx.Response(200, json=fallback)) == fallback["model_used"]
+    assert model_used(httpx.Response(200, json={"status": "completed", "result": fallback})) == fallback["model_used"]
+    assert model_used(httpx.Response(
+        200, content=msgpack.packb({"model_used": "gpt-3.5-turbo"}), headers={"Content-Type": "application/msgpack"}
+    )) == "gpt-3.5-turbo"
+    assert model_used(httpx.Response(200, json={"status": "healthy"})) is None
+    assert model_used(httpx.Response(503, json={"detail": "unavailable"})) is None
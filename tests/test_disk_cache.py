@@ -0,0 +1,154 @@
+import pytest
+import sys
+import os
+import sqlite3
+import multiprocessing
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import fakeredis
+from fastapi.testclient import TestClient
+from app import main
+from app.disk_cache import DiskCache
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    # Refresh access times on every read so LRU order is exact in tests
+    return DiskCache(str(tmp_path / "cache.db"), max_bytes=1000, touch_interval=0)
+
+@pytest.fixture
+def disk_only(tmp_path, monkeypatch):
+    """Run the app with Redis unavailable and a fresh disk cache"""
+    cache = DiskCache(str(tmp_path / "app_cache.db"))
+    monkeypatch.setattr(main, "redis_client", None)
+    monkeypatch.setattr(main, "disk_cache", cache)
+    main.limiter.reset()
+    yield cache
+    main.limiter.reset()
+
+def _write_entries(path, start):
+    cache = DiskCache(path, max_bytes=10 * 1024 * 1024)
+    for i in range(start, start + 50):
+        cache.set(f"analysis:{i}", b"x" * 100)
+
+def _read_entries(path, keys, iterations):
+    cache = DiskCache(path)
+    for _ in range(iterations):
+        for key in keys:
+            assert cache.get(key) == b"hot"
+
+def test_set_and_get(disk_cache):
+    """Test values round-trip through the disk cache"""
+    disk_cache.set("analysis:a", b"value")
+    assert disk_cache.get("analysis:a") == b"value"
+    assert disk_cache.get("analysis:missing") is None
+
+def test_overwrite_tracks_size(disk_cache):
+    """Test replacing a value updates the stored byte count"""
+    disk_cache.set("analysis:a", b"x" * 100)
+    disk_cache.set("analysis:a", b"x" * 10)
+    assert disk_cache.stats() == {"entries": 1, "bytes": 10, "max_bytes": 1000}
+
+def test_evicts_least_recently_used(disk_cache):
+    """Test the cache stays under its size bound by evicting old entries"""
+    for i in range(5):
+        disk_cache.set(f"analysis:{i}", b"x" * 200)
+    # Touch the oldest entry so it is no longer the least recently used
+    assert disk_cache.get("analysis:0") is not None
+    disk_cache.set("analysis:5", b"x" * 200)
+
+    stats = disk_cache.stats()
+    assert stats["bytes"] <= 1000
+    assert disk_cache.get("analysis:0") is not None
+    assert disk_cache.get("analysis:1") is None
+    assert disk_cache.get("analysis:5") is not None
+
+def test_delete_prefix(disk_cache):
+    """Test clearing only removes matching keys"""
+    disk_cache.set("analysis:a", b"1")
+    disk_cache.set("analysis:b", b"2")
+    disk_cache.set("other:c", b"3")
+    assert disk_cache.delete_prefix("analysis:") == 2
+    assert disk_cache.get("other:c") == b"3"
+    assert disk_cache.stats()["bytes"] == 1
+
+def test_concurrent_processes(tmp_path):
+    """Test several worker processes can write to the same cache file"""
+    path = str(tmp_path / "shared.db")
+    DiskCache(path)
+    processes = [multiprocessing.Process(target=_write_entries, args=(path, i * 50)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert DiskCache(path).stats()["entries"] == 200
+
+def test_recent_reads_do_not_write(tmp_path):
+    """Test hits only refresh the access time once it is older than touch_interval"""
+    path = str(tmp_path / "touch.db")
+    cache = DiskCache(path, touch_interval=60)
+    cache.set("analysis:a", b"value")
+    accessed = sqlite3.connect(path).execute("SELECT accessed FROM cache").fetchone()[0]
+
+    for _ in range(10):
+        assert cache.get("analysis:a") == b"value"
+    assert sqlite3.connect(path).execute("SELECT accessed FROM cache").fetchone()[0] == accessed
+
+    stale = accessed - 120
+    sqlite3.connect(path, isolation_level=None).execute("UPDATE cache SET accessed = ?", (stale,))
+    cache.get("analysis:a")
+    assert sqlite3.connect(path).execute("SELECT accessed FROM cache").fetchone()[0] > stale
+
+def test_concurrent_readers_and_writers(tmp_path):
+    """Test worker processes can read hot keys while others write to the same file"""
+    path = str(tmp_path / "mixed.db")
+    cache = DiskCache(path)
+    hot_keys = [f"analysis:hot{i}" for i in range(10)]
+    for key in hot_keys:
+        cache.set(key, b"hot")
+
+    processes = [multiprocessing.Process(target=_read_entries, args=(path, hot_keys, 100)) for _ in range(3)]
+    processes += [multiprocessing.Process(target=_write_entries, args=(path, i * 50)) for i in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    assert DiskCache(path).stats()["entries"] == 160
+
+def test_disk_hit_backfills_redis(tmp_path, monkeypatch):
+    """Test a value found only on disk is written back to Redis"""
+    fake = fakeredis.FakeRedis()
+    cache = DiskCache(str(tmp_path / "backfill.db"))
+    monkeypatch.setattr(main, "redis_client", fake)
+    monkeypatch.setattr(main, "disk_cache", cache)
+
+    main.set_cached_result("analysis:backfill", {"sentiment": "neutral"})
+    fake.delete("analysis:backfill")
+
+    assert main.get_cached_result("analysis:backfill")["cached"] is True
+    assert fake.get("analysis:backfill") == cache.get("analysis:backfill")
+
+def test_analyze_uses_disk_cache_without_redis(disk_only):
+    """Test repeated requests are served from disk when Redis is unavailable"""
+    payload = {"text": "The disk cache keeps this analysis warm."}
+    first = client.post("/analyze", json=payload)
+    second = client.post("/analyze", json=payload)
+    assert first.status_code == 200
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+    assert "disk_get;dur=" in second.headers["server-timing"]
+
+def test_clear_cache_without_redis(disk_only):
+    """Test clearing works against the disk cache alone"""
+    client.post("/analyze", json={"text": "Something to clear from the cache."})
+    response = client.delete("/cache/clear")
+    assert response.status_code == 200
+    assert response.json()["message"] == "Cleared 1 cached items"
+    assert disk_only.stats()["entries"] == 0
@@ -0,0 +1,168 @@
+import pytest
+import sys
+import os
+import time
+import threading
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import fakeredis
+from fastapi.testclient import TestClient
+from app import main, worker
+from app.jobs import DEAD_LETTER_STREAM, JOB_GROUP, JOB_MAX_ATTEMPTS, JOB_STREAM, ensure_group, job_key
+
+client = TestClient(main.app)
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Run the app and workers against an in-memory Redis"""
+    fake = fakeredis.FakeRedis()
+    ensure_group(fake)
+    monkeypatch.setattr(main, "redis_client", fake)
+    monkeypatch.setattr(main, "disk_cache", None)
+    main.limiter.reset()
+    yield fake
+    main.limiter.reset()
+
+def test_submit_job_requires_redis(monkeypatch):
+    """Test job submission is rejected when Redis is unavailable"""
+    monkeypatch.setattr(main, "redis_client", None)
+    main.limiter.reset()
+    response = client.post("/analyze/jobs", json={"text": "Queue this text for later."})
+    assert response.status_code == 503
+
+def test_submit_job_validates_text(fake_redis):
+    """Test job submission applies the same validation as /analyze"""
+    response = client.post("/analyze/jobs", json={"text": "hi"})
+    assert response.status_code == 400
+    assert fake_redis.xlen(JOB_STREAM) == 0
+
+def test_job_is_processed_by_worker(fake_redis):
+    """Test a queued job is picked up by a worker and its result can be polled"""
+    response = client.post("/analyze/jobs", json={"text": "I love how great this queue works."})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    assert response.json()["status"] == "queued"
+
+    assert worker.process_batch(fake_redis, "test-worker", block_ms=None) == 1
+
+    response = client.get(f"/analyze/jobs/{job_id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "completed"
+    assert data["attempts"] == 1
+    assert data["result"]["sentiment"] == "positive"
+    assert fake_redis.xpending(JOB_STREAM, JOB_GROUP)["pending"] == 0
+    # The worker stores results through the normal cache path
+    assert fake_redis.get(main.get_cache_key("I love how great this queue works.")) is not None
+
+def test_cached_text_completes_immediately(fake_redis):
+    """Test submitting an already analyzed text skips the queue"""
+    text = "This text was already analyzed before."
+    main.set_cached_result(main.get_cache_key(text), main.run_analysis(text, main.get_cache_key(text)))
+
+    response = client.post("/analyze/jobs", json={"text": text})
+    assert response.status_code == 202
+    assert response.json()["status"] == "completed"
+    assert response.json()["result"]["cached"] is True
+    assert fake_redis.xlen(JOB_STREAM) == 0
+
+def test_long_poll_times_out_while_queued(fake_redis):
+    """Test long-polling returns the current status once the wait expires"""
+    job_id = client.post("/analyze/jobs", json={"text": "Nobody is processing this job."}).json()["job_id"]
+    response = client.get(f"/analyze/jobs/{job_id}?wait=0.2")
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+
+@pytest.mark.parametrize("wait", ["nan", "inf", "-1", "31"])
+def test_long_poll_rejects_invalid_wait(fake_redis, wait):
+    """Test non-finite or out-of-range waits are rejected instead of polling forever"""
+    job_id = client.post("/analyze/jobs", json={"text": "Nobody is processing this job."}).json()["job_id"]
+    response = client.get(f"/analyze/jobs/{job_id}?wait={wait}")
+    assert response.status_code == 422
+
+@pytest.mark.parametrize("job_id", ["does-not-exist", "0" * 32, "stream", "dead", "0" * 31 + "A"])
+def test_unknown_job(fake_redis, job_id):
+    """Test polling an unknown job, or a name that isn't a job ID, returns 404"""
+    response = client.get(f"/analyze/jobs/{job_id}")
+    assert response.status_code == 404
+
+def test_job_keys_do_not_collide_with_streams():
+    """Test job state lives under its own prefix, apart from the stream keys"""
+    assert job_key("stream") != JOB_STREAM
+    assert job_key("dead") != DEAD_LETTER_STREAM
+
+def test_stalled_job_is_reclaimed(fake_redis, monkeypatch):
+    """Test a job delivered to a crashed worker is retried by another worker"""
+    monkeypatch.setattr(worker, "JOB_CLAIM_IDLE_MS", 0)
+    job_id = client.post("/analyze/jobs", json={"text": "This job outlives its first worker."}).json()["job_id"]
+
+    # Simulate a worker that read the job and crashed before acknowledging it
+    fake_redis.xreadgroup(JOB_GROUP, "crashed-worker", {JOB_STREAM: ">"}, count=1)
+
+    assert worker.process_batch(fake_redis, "healthy-worker", block_ms=None) == 1
+    assert client.get(f"/analyze/jobs/{job_id}").json()["status"] == "completed"
+
+def test_running_job_is_not_reclaimed(fake_redis, monkeypatch):
+    """Test a job that is still being analyzed keeps its claim past the idle timeout"""
+    monkeypatch.setattr(worker, "JOB_CLAIM_IDLE_MS", 150)
+    job_id = client.post("/analyze/jobs", json={"text": "This job takes a while to analyze."}).json()["job_id"]
+    started = threading.Event()
+    release = threading.Event()
+    slow_analysis = main.run_analysis
+
+    def blocking_analysis(text, cache_key):
+        started.set()
+        release.wait(5)
+        return slow_analysis(text, cache_key)
+
+    monkeypatch.setattr(main, "run_analysis", blocking_analysis)
+    first = threading.Thread(target=worker.process_batch, args=(fake_redis, "slow-worker"), kwargs={"block_ms": None})
+    first.start()
+    try:
+        assert started.wait(5)
+        time.sleep(0.5)
+        assert worker.process_batch(fake_redis, "other-worker", block_ms=None) == 0
+    finally:
+        release.set()
+        first.join()
+
+    data = client.get(f"/analyze/jobs/{job_id}").json()
+    assert data["status"] == "completed"
+    assert data["attempts"] == 1
+
+def test_upstream_call_has_timeout(fake_redis, monkeypatch):
+    """Test the upstream request can't hang longer than a job's claim timeout"""
+    calls = []
+
+    def fake_post(*args, **kwargs):
+        calls.append(kwargs)
+        raise main.requests.exceptions.Timeout("upstream hung")
+
+    monkeypatch.setattr(main, "GENAI_API_KEY", "test-key")
+    monkeypatch.setattr(main.requests, "post", fake_post)
+    text = "An upstream call that never answers."
+    result = main.run_analysis(text, main.get_cache_key(text))
+
+    assert 0 < calls[0]["timeout"] < worker.JOB_CLAIM_IDLE_MS / 1000
+    assert "fallback" in result["model_used"]
+
+def test_job_moves_to_dead_letter_queue(fake_redis, monkeypatch):
+    """Test a job that keeps failing ends up in the dead-letter stream"""
+    monkeypatch.setattr(worker, "JOB_CLAIM_IDLE_MS", 0)
+    job_id = client.post("/analyze/jobs", json={"text": "This job will never succeed."}).json()["job_id"]
+
+    def failing_analysis(text, cache_key):
+        raise RuntimeError("analysis exploded")
+
+    monkeypatch.setattr(main, "run_analysis", failing_analysis)
+    for _ in range(JOB_MAX_ATTEMPTS + 1):
+        worker.process_batch(fake_redis, "test-worker", block_ms=None)
+
+    data = client.get(f"/analyze/jobs/{job_id}").json()
+    assert data["status"] == "failed"
+    assert data["error"] == "analysis exploded"
+    assert fake_redis.xlen(DEAD_LETTER_STREAM) == 1
+    assert fake_redis.xpending(JOB_STREAM, JOB_GROUP)["pending"] == 0
+    assert int(fake_redis.hget(job_key(job_id), "attempts")) == JOB_MAX_ATTEMPTS + 1
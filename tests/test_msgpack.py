@@ -0,0 +1,100 @@
+import pytest
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import fakeredis
+import msgpack
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+from app import main
+from app.negotiation import wants_msgpack
+
+client = TestClient(main.app)
+
+MSGPACK_HEADERS = {"Content-Type": "application/msgpack", "Accept": "application/msgpack"}
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    main.limiter.reset()
+    yield
+    main.limiter.reset()
+
+def _request_with_accept(accept):
+    return Request({"type": "http", "headers": [(b"accept", accept.encode())]})
+
+def test_msgpack_request_and_response():
+    """Test /analyze round-trips msgpack bodies"""
+    response = client.post(
+        "/analyze",
+        content=msgpack.packb({"text": "I love getting compact binary responses."}),
+        headers=MSGPACK_HEADERS
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert response.headers["vary"] == "Accept"
+    data = msgpack.unpackb(response.content)
+    assert data["sentiment"] == "positive"
+    assert set(data) == set(main.AnalysisResponse.model_fields)
+
+def test_msgpack_request_defaults_to_json_response():
+    """Test JSON stays the response format unless msgpack is requested"""
+    response = client.post(
+        "/analyze",
+        content=msgpack.packb({"text": "A msgpack request without an Accept header."}),
+        headers={"Content-Type": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["vary"] == "Accept"
+    assert "sentiment" in response.json()
+
+def test_json_request_with_msgpack_response():
+    """Test JSON callers can ask for a msgpack response"""
+    response = client.post(
+        "/analyze",
+        json={"text": "A JSON request asking for msgpack back."},
+        headers={"Accept": "application/msgpack"}
+    )
+    assert response.status_code == 200
+    assert "sentiment" in msgpack.unpackb(response.content)
+
+def test_msgpack_validation_errors():
+    """Test msgpack bodies go through the same validation as JSON"""
+    response = client.post("/analyze", content=msgpack.packb({"text": "hi"}), headers=MSGPACK_HEADERS)
+    assert response.status_code == 400
+    assert "at least 10 characters" in response.json()["detail"]
+
+    response = client.post("/analyze", content=msgpack.packb({"wrong": "field"}), headers=MSGPACK_HEADERS)
+    assert response.status_code == 422
+
+def test_invalid_msgpack_body():
+    """Test undecodable msgpack bodies are rejected"""
+    response = client.post("/analyze", content=b"\xc1not msgpack", headers=MSGPACK_HEADERS)
+    assert response.status_code == 400
+    assert "Invalid msgpack body" in response.json()["detail"]
+
+def test_msgpack_job_submission(monkeypatch):
+    """Test the job endpoints negotiate msgpack too"""
+    monkeypatch.setattr(main, "redis_client", fakeredis.FakeRedis())
+    monkeypatch.setattr(main, "disk_cache", None)
+    response = client.post(
+        "/analyze/jobs",
+        content=msgpack.packb({"text": "Queue this binary request please."}),
+        headers=MSGPACK_HEADERS
+    )
+    assert response.status_code == 202
+    job = msgpack.unpackb(response.content)
+    assert job["status"] == "queued"
+
+    response = client.get(f"/analyze/jobs/{job['job_id']}", headers={"Accept": "application/msgpack"})
+    assert msgpack.unpackb(response.content)["job_id"] == job["job_id"]
+
+def test_accept_header_preference():
+    """Test msgpack is only chosen when preferred over JSON"""
+    assert wants_msgpack(_request_with_accept("application/msgpack"))
+    assert wants_msgpack(_request_with_accept("application/json;q=0.5, application/x-msgpack"))
+    assert not wants_msgpack(_request_with_accept("application/json, application/msgpack"))
+    assert not wants_msgpack(_request_with_accept("*/*"))
@@ -0,0 +1,137 @@
+import pytest
+import sys
+import os
+import threading
+import time
+
+# Add the app directory to the Python path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.testclient import TestClient
+from app import main
+from app.profiling import (
+    SamplingProfiler,
+    ServerTimingMiddleware,
+    percentile,
+    record_stage,
+    reset_stage_stats,
+    stage,
+    stage_percentiles,
+)
+
+client = TestClient(main.app)
+
+@pytest.fixture(autouse=True)
+def reset_state():
+    """Reset rate limits and stage stats so tests don't affect each other"""
+    main.limiter.reset()
+    reset_stage_stats()
+    yield
+    main.limiter.reset()
+
+def test_analyze_reports_server_timing():
+    """Test analyze responses include per-stage Server-Timing entries"""
+    response = client.post("/analyze", json={"text": "This is a great test sentence for timing."})
+    assert response.status_code == 200
+    server_timing = response.headers["server-timing"]
+    for name in ("request", "validate", "cache_key", "serialize", "total"):
+        assert f"{name};dur=" in server_timing
+
+def test_validation_error_reports_server_timing():
+    """Test failed validation still reports the stages that ran"""
+    response = client.post("/analyze", json={"text": "hi"})
+    assert response.status_code == 400
+    assert "validate;dur=" in response.headers["server-timing"]
+
+def test_stage_stats_endpoint():
+    """Test rolling stage percentiles are exposed"""
+    client.post("/analyze", json={"text": "This is a great test sentence for timing."})
+    response = client.get("/metrics/stages")
+    assert response.status_code == 200
+    stages = response.json()["stages"]
+    assert "serialize" in stages
+    assert stages["serialize"]["count"] >= 1
+    assert stages["serialize"]["p50_ms"] <= stages["serialize"]["p99_ms"]
+
+def test_stage_percentiles():
+    """Test percentiles are computed over recorded durations"""
+    for _ in range(100):
+        with stage("test_stage"):
+            pass
+    stats = stage_percentiles()["test_stage"]
+    assert stats["count"] == 100
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+def test_percentile_nearest_rank():
+    """Test percentiles match nearest-rank values rather than rounding down the tail"""
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile(list(range(1, 61)), 99) == 60
+    assert percentile(list(range(1, 151)), 99) == 149
+    assert percentile(list(range(1, 101)), 95) == 95
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+def test_stage_percentiles_known_values():
+    """Test stage stats report the nearest-rank percentiles of recorded durations"""
+    for value in range(1, 201):
+        record_stage("known_stage", float(value))
+    stats = stage_percentiles()["known_stage"]
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (100, 190, 198, 200)
+
+def test_timing_middleware_is_plain_asgi():
+    """Test the timing middleware wraps the app directly rather than via BaseHTTPMiddleware"""
+    assert any(middleware.cls is ServerTimingMiddleware for middleware in main.app.user_middleware)
+    assert not any(middleware.cls.__name__ == "BaseHTTPMiddleware" for middleware in main.app.user_middleware)
+
+def test_profile_window_disabled_by_default():
+    """Test the profiling endpoint is hidden unless enabled"""
+    response = client.post("/debug/profile?seconds=1")
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("seconds", ["nan", "inf", "0", "-1", "301"])
+def test_profile_window_rejects_invalid_seconds(monkeypatch, seconds):
+    """Test non-finite or out-of-range windows are rejected instead of sampling forever"""
+    started = []
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(main, "SamplingProfiler", lambda *args, **kwargs: started.append(args))
+    response = client.post(f"/debug/profile?seconds={seconds}")
+    assert response.status_code == 422
+    assert started == []
+
+def test_per_request_profile(tmp_path, monkeypatch):
+    """Test X-Profile writes a collapsed-stack profile when enabled"""
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(main, "PROFILE_DIR", str(tmp_path))
+    response = client.post(
+        "/analyze",
+        json={"text": "This is a great test sentence for profiling."},
+        headers={"X-Profile": "1"}
+    )
+    assert response.status_code == 200
+    output = response.headers["x-profile-output"]
+    assert output.startswith(str(tmp_path))
+    assert os.path.exists(output)
+
+def test_sampling_profiler_collapsed_output(tmp_path):
+    """Test the profiler samples a busy thread in collapsed-stack format"""
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop)
+    worker.start()
+    profiler = SamplingProfiler(worker.ident, interval=0.001, output_dir=str(tmp_path))
+    profiler.start()
+    time.sleep(0.1)
+    path = profiler.stop()
+    stop.set()
+    worker.join()
+
+    with open(path) as f:
+        lines = [line for line in f.read().splitlines() if line]
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert "busy_loop" in stack
+    assert int(count) >= 1